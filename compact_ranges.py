@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 
-import json
+import functools
+import numpy as np
+import orjson
+import os
 import requests
+import socket
 import sys
-from ipaddress import IPv4Network, IPv6Network, collapse_addresses, ip_network
-from collections import defaultdict
-from datetime import datetime
+from ipaddress import IPv4Network, IPv6Network
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
 # This script fetches the AWS IP ranges, extracts the IPv4 and IPv6 prefixes,
 # and then coalesces them into the most compact representation possible.
@@ -20,222 +24,658 @@ from datetime import datetime
 # Define the URL for the AWS IP ranges JSON file.
 AWS_IP_RANGES_URL = "https://ip-ranges.amazonaws.com/ip-ranges.json"
 
+# Define the (region, service, network_border_group) used when metadata is lost.
+OTHER_METADATA = ('other', 'OTHER', 'other')
+
+# Define where the last downloaded JSON and its ETag are kept between runs.
+CACHE_DIR = ".cache"
+CACHE_BODY_FILE = os.path.join(CACHE_DIR, "ip-ranges.json")
+CACHE_ETAG_FILE = os.path.join(CACHE_DIR, "ip-ranges.etag")
+
+# Reuse one HTTP session, so repeated fetches keep the connection open.
+# requests asks for brotli ("br") compression on its own whenever the
+# brotli package can be imported.
+SESSION = requests.Session()
+
+@functools.lru_cache(maxsize=None)
 def get_ip_ranges():
     """
     Fetches the AWS IP ranges JSON from the specified URL.
 
+    The last response is cached on disk along with its ETag. If the server
+    reports that it has not changed, the cached copy is used instead of
+    downloading it again.
+
     Args:
         None
 
     Returns:
         dict: A dictionary containing the parsed JSON data, or None on error.
     """
+    headers = {}
+    # Only revalidate if the body that the ETag refers to is still around.
+    if os.path.exists(CACHE_BODY_FILE) and os.path.exists(CACHE_ETAG_FILE):
+        with open(CACHE_ETAG_FILE) as f:
+            headers['If-None-Match'] = f.read().strip()
+
     try:
-        # Use requests to get the data from the URL.
-        response = requests.get(AWS_IP_RANGES_URL, timeout=10)
+        # Use the shared session to get the data from the URL.
+        response = SESSION.get(AWS_IP_RANGES_URL, headers=headers, timeout=10)
+        # The cached copy is still current, so parse and return it.
+        if response.status_code == requests.codes.not_modified:
+            with open(CACHE_BODY_FILE, 'rb') as f:
+                return orjson.loads(f.read())
         # Raise an HTTPError for bad responses (4xx or 5xx).
         response.raise_for_status()
-        # Parse the JSON and return the data.
-        return response.json()
-    except requests.RequestException as e:
+        # Parse the JSON.
+        data = orjson.loads(response.content)
+    except (requests.RequestException, orjson.JSONDecodeError) as e:
         # If there's a request error, print it to stderr and exit.
         print(f"Error fetching IP ranges: {e}", file=sys.stderr)
         sys.exit(1)
 
-def coalesce_prefixes(prefixes, ip_version):
+    # Cache the body and its ETag for the next run.
+    etag = response.headers.get('ETag')
+    if etag:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(CACHE_BODY_FILE, 'wb') as f:
+            f.write(response.content)
+        with open(CACHE_ETAG_FILE, 'w') as f:
+            f.write(etag)
+
+    return data
+
+def _parse_v4_bulk(prefixes):
+    """
+    Parses IPv4 prefix strings into integer network bounds in a single pass.
+
+    Args:
+        prefixes (list): A list of IPv4 prefix strings (e.g., '1.2.3.0/24').
+
+    Returns:
+        tuple: Three numpy arrays (starts, ends, prefixlens) holding the first
+            address and last address (uint32) and prefix length (uint8) of
+            each network.
+    """
+    # Pack every address into four bytes and read them all back at once as
+    # one big-endian array.
+    pairs = [p.split('/', 1) for p in prefixes]
+    packed = b''.join(socket.inet_pton(socket.AF_INET, address) for address, _ in pairs)
+    networks = np.frombuffer(packed, dtype='>u4').astype(np.uint32)
+    prefixlens = np.fromiter(
+        (int(prefixlen) for _, prefixlen in pairs), dtype=np.uint8, count=len(pairs)
+    )
+
+    # Build the netmasks in 64-bit space so that a /0 shifts cleanly to zero.
+    masks = (
+        (np.uint64(0xFFFFFFFF) << (32 - prefixlens).astype(np.uint64)) & np.uint64(0xFFFFFFFF)
+    ).astype(np.uint32)
+
+    starts = networks & masks
+    ends = starts | ~masks
+    return starts, ends, prefixlens
+
+def _parse_v6_bulk(prefixes):
+    """
+    Parses IPv6 prefix strings into integer network bounds.
+
+    IPv6 addresses do not fit in a NumPy integer type, so each address is
+    held as a row of two uint64 words (high, low). Sorting and masking then
+    stay vectorized instead of going through Python ints.
+
+    Args:
+        prefixes (list): A list of IPv6 prefix strings (e.g., '2600:1f00::/24').
+
+    Returns:
+        tuple: Three numpy arrays (starts, ends, prefixlens): the first and
+            last address of each network as (n, 2) uint64 arrays, and the
+            prefix lengths as uint8.
+    """
+    # Pack every address into sixteen bytes and read them all back at once
+    # as pairs of big-endian words.
+    pairs = [p.split('/', 1) for p in prefixes]
+    packed = b''.join(socket.inet_pton(socket.AF_INET6, address) for address, _ in pairs)
+    networks = np.frombuffer(packed, dtype='>u8').astype(np.uint64).reshape(-1, 2)
+    prefixlens = np.fromiter(
+        (int(prefixlen) for _, prefixlen in pairs), dtype=np.uint8, count=len(pairs)
+    )
+
+    # Split each prefix length over the two words. NumPy shifts by 64 or more
+    # give zero, so a word with no network bits gets an empty mask.
+    high_bits = np.minimum(prefixlens, 64).astype(np.uint64)
+    low_bits = np.maximum(prefixlens.astype(np.int64) - 64, 0).astype(np.uint64)
+    masks = np.stack([
+        ~np.uint64(0) << (np.uint64(64) - high_bits),
+        ~np.uint64(0) << (np.uint64(64) - low_bits)
+    ], axis=1)
+
+    starts = networks & masks
+    ends = starts | ~masks
+    return starts, ends, prefixlens
+
+def _to_ints(addresses):
+    """
+    Converts an address array to a list of Python ints.
+
+    Args:
+        addresses (numpy.ndarray): A uint32 array, or an (n, 2) uint64 array
+            of (high, low) words.
+
+    Returns:
+        list: The addresses as Python ints.
+    """
+    if addresses.ndim == 1:
+        return addresses.tolist()
+    return [(high << 64) | low for high, low in addresses.tolist()]
+
+def _sort_keys(addresses):
+    """
+    Returns np.lexsort keys for an address array, most significant last.
+
+    Args:
+        addresses (numpy.ndarray): A uint32 array, or an (n, 2) uint64 array
+            of (high, low) words.
+
+    Returns:
+        numpy.ndarray: The keys, one row per word.
+    """
+    return np.atleast_2d(addresses.T)[::-1]
+
+def _metadata_key(entry):
+    """
+    Returns the (region, service, network_border_group) tuple of an entry.
+
+    Args:
+        entry (dict): A prefix entry from the AWS data.
+
+    Returns:
+        tuple: The metadata, with "other" defaults for missing fields.
+    """
+    return (
+        entry.get('region', 'other'),
+        entry.get('service', 'OTHER'),
+        entry.get('network_border_group', 'other')
+    )
+
+def _parse_prefixes_once(raw_data):
+    """
+    Parses every IPv4 and IPv6 prefix in the AWS data into integer arrays.
+
+    Both the compacted and the merged output are built from the result, so
+    each prefix string is only parsed once.
+
+    Args:
+        raw_data (dict): The AWS IP ranges JSON data.
+
+    Returns:
+        tuple: (v4_starts, v4_ends, v4_meta, v6_starts, v6_ends, v6_meta),
+            where the start and end arrays hold the first and last address of
+            each network and the meta lists hold its metadata tuple.
+    """
+    ipv4_entries = raw_data.get('prefixes', [])
+    ipv6_entries = raw_data.get('ipv6_prefixes', [])
+
+    v4_starts, v4_ends, _ = _parse_v4_bulk([e['ip_prefix'] for e in ipv4_entries])
+    v6_starts, v6_ends, _ = _parse_v6_bulk([e['ipv6_prefix'] for e in ipv6_entries])
+
+    return (
+        v4_starts, v4_ends, [_metadata_key(e) for e in ipv4_entries],
+        v6_starts, v6_ends, [_metadata_key(e) for e in ipv6_entries]
+    )
+
+def _unique_ranges(starts, ends, width):
+    """
+    Drops duplicate ranges before they are merged.
+
+    Each range is packed into a single sort key, so that one sort in
+    np.unique finds every duplicate.
+
+    Args:
+        starts (numpy.ndarray): The first address of each range.
+        ends (numpy.ndarray): The last address of each range.
+        width (int): The address width in bits (32 or 128).
+
+    Returns:
+        tuple: The (starts, ends) arrays of the distinct ranges, sorted.
+    """
+    if width == 32:
+        # Two 32-bit addresses fit in one uint64 key.
+        keys = np.unique((starts.astype(np.uint64) << np.uint64(32)) | ends)
+        return (
+            (keys >> np.uint64(32)).astype(np.uint32),
+            (keys & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+        )
+
+    # IPv6 ranges are two words each, so sort whole (start, end) rows and
+    # keep each row that differs from the one before it.
+    rows = np.hstack([starts, ends])
+    rows = rows[np.lexsort(_sort_keys(rows))]
+    keep = np.ones(len(rows), dtype=bool)
+    keep[1:] = (rows[1:] != rows[:-1]).any(axis=1)
+    rows = rows[keep]
+    return rows[:, :2], rows[:, 2:]
+
+def _collapse_ranges(starts, ends, width):
+    """
+    Collapses sorted CIDR ranges into the minimal list of CIDR blocks.
+
+    Each block is pushed onto a stack after dropping any block it covers,
+    then the top two blocks are merged into their parent for as long as they
+    are buddies: the same prefix length, differing only in the last network
+    bit. This uses integer operations only.
+
+    Args:
+        starts (numpy.ndarray): The first address of each range, sorted and
+            unique as returned by _unique_ranges.
+        ends (numpy.ndarray): The last address of each range.
+        width (int): The address width in bits (32 or 128).
+
+    Returns:
+        list: A sorted list of (network, prefixlen) integer pairs.
+    """
+    stack = []
+    for start, end in zip(_to_ints(starts), _to_ints(ends)):
+        if stack and stack[-1][0] == start:
+            # Ranges with the same start are sorted narrowest first, so this
+            # block covers the previous one.
+            stack.pop()
+        elif stack and start <= stack[-1][1]:
+            # Already covered by the previous block.
+            continue
+
+        stack.append((start, end, width - (end - start).bit_length()))
+
+        # Merge buddy pairs, cascading up as long as the new parent has one.
+        while len(stack) > 1:
+            low_start, _, low_prefixlen = stack[-2]
+            high_start, high_end, high_prefixlen = stack[-1]
+            if low_prefixlen != high_prefixlen or \
+               low_start ^ high_start != 1 << (width - high_prefixlen):
+                break
+            stack[-2:] = [(low_start, high_end, high_prefixlen - 1)]
+
+    return [(start, prefixlen) for start, _, prefixlen in stack]
+
+# Pre-render the "/prefixlen" suffix of every possible prefix length, so the
+# formatters below only have to render the address.
+_PREFIXLEN_SUFFIXES = [f"/{prefixlen}" for prefixlen in range(129)]
+
+def _fmt_v4(network, prefixlen):
+    """
+    Formats an IPv4 network integer and prefix length as a CIDR string.
+
+    Args:
+        network (int): The network address.
+        prefixlen (int): The prefix length.
+
+    Returns:
+        str: The CIDR string (e.g., '1.2.3.0/24').
+    """
+    return socket.inet_ntoa(network.to_bytes(4, 'big')) + _PREFIXLEN_SUFFIXES[prefixlen]
+
+def _fmt_v6(network, prefixlen):
+    """
+    Formats an IPv6 network integer and prefix length as a CIDR string.
+
+    Args:
+        network (int): The network address.
+        prefixlen (int): The prefix length.
+
+    Returns:
+        str: The compressed CIDR string (e.g., '2600:1f00::/24').
+    """
+    return (
+        socket.inet_ntop(socket.AF_INET6, network.to_bytes(16, 'big'))
+        + _PREFIXLEN_SUFFIXES[prefixlen]
+    )
+
+def _coalesce_cidrs(starts, ends, ip_version):
     """
-    Coalesces a list of IP prefixes.
+    Coalesces a list of IP networks into integer CIDR pairs.
 
     Args:
-        prefixes (list): A list of IP prefix strings (e.g., '1.2.3.0/24').
+        starts (numpy.ndarray): The first address of each network.
+        ends (numpy.ndarray): The last address of each network.
         ip_version (int): The IP version to use (4 for IPv4, 6 for IPv6).
 
     Returns:
-        list: A sorted list of coalesced IP network objects.
+        list: A sorted list of coalesced (network, prefixlen) integer pairs.
     """
     if ip_version == 4:
-        # Create IPv4Network objects for each prefix.
-        networks = [IPv4Network(p) for p in prefixes]
+        width = 32
     elif ip_version == 6:
-        # Create IPv6Network objects.
-        networks = [IPv6Network(p) for p in prefixes]
+        width = 128
     else:
         # Exit with an error for an invalid IP version.
         print("Invalid IP version specified.", file=sys.stderr)
         sys.exit(1)
 
-    # Use the collapse_addresses function to merge the networks.
-    return list(collapse_addresses(networks))
+    # Drop duplicates, then collapse the integer ranges into CIDR blocks.
+    starts, ends = _unique_ranges(starts, ends, width)
+    return _collapse_ranges(starts, ends, width)
+
+def coalesce_prefixes(starts, ends, ip_version):
+    """
+    Coalesces a list of IP networks.
+
+    Args:
+        starts (numpy.ndarray): The first address of each network.
+        ends (numpy.ndarray): The last address of each network.
+        ip_version (int): The IP version to use (4 for IPv4, 6 for IPv6).
+
+    Returns:
+        list: A sorted list of coalesced IP network objects.
+    """
+    cidrs = _coalesce_cidrs(starts, ends, ip_version)
+    network_class = IPv4Network if ip_version == 4 else IPv6Network
+    return [network_class(cidr) for cidr in cidrs]
+
+def _trie_descend(node, network, depth, prefixlen, metadata, width):
+    """
+    Walks down the trie towards a network, creating missing nodes.
+
+    Args:
+        node (list): The node to start from.
+        network (int): The network address.
+        depth (int): The depth of the starting node.
+        prefixlen (int): The depth to walk down to.
+        metadata (tuple): The metadata of the network being inserted.
+        width (int): The address width in bits (32 or 128).
+
+    Returns:
+        list: The node at prefixlen, or None if an enclosing network was found
+            on the way. That network falls back to "other" metadata if its
+            metadata differs.
+    """
+    for depth in range(depth, prefixlen):
+        if node[2] is not None:
+            # An enclosing network is already in the trie.
+            if node[2] != metadata:
+                node[2] = OTHER_METADATA
+            return None
+        bit = (network >> (width - 1 - depth)) & 1
+        if node[bit] is None:
+            node[bit] = [None, None, None]
+        node = node[bit]
+    return node
+
+def _trie_insert(root, index, network, prefixlen, metadata, width):
+    """
+    Inserts a network into a binary trie of metadata-tagged networks.
+
+    Each node is a [zero_child, one_child, metadata] list, and a node with
+    metadata is a terminal holding one network. Overlaps are found while
+    walking down: a terminal on the path already covers the new network, and
+    any subtree below the new terminal is covered by it. The covering network
+    is kept and falls back to "other" metadata if the metadata differs.
+
+    The walk starts from an index of the nodes for the leftmost octet (IPv4)
+    or 16 bits (IPv6), so the top of the trie is only walked once per bucket.
 
-def coalesce_with_metadata(prefixes_data, ip_version):
+    Args:
+        root (list): The root node of the trie.
+        index (dict): The bucket index, mapping leading bits to their node.
+        network (int): The network address.
+        prefixlen (int): The prefix length.
+        metadata (tuple): The (region, service, network_border_group) tuple.
+        width (int): The address width in bits (32 or 128).
+    """
+    stride = 8 if width == 32 else 16
+    if prefixlen < stride:
+        # A network wider than a bucket may fold indexed nodes into itself.
+        index.clear()
+        node = _trie_descend(root, network, 0, prefixlen, metadata, width)
+    else:
+        bucket = network >> (width - stride)
+        node = index.get(bucket)
+        if node is None:
+            node = _trie_descend(root, network, 0, stride, metadata, width)
+            if node is None:
+                return
+            index[bucket] = node
+        node = _trie_descend(node, network, stride, prefixlen, metadata, width)
+
+    if node is None:
+        return
+
+    if node[2] is not None:
+        # The same network is already in the trie.
+        if node[2] != metadata:
+            node[2] = OTHER_METADATA
+        return
+
+    # Fold any networks below this one into it.
+    covered = set()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current[2] is not None:
+            covered.add(current[2])
+        else:
+            stack.extend(child for child in current[:2] if child is not None)
+    node[2] = metadata if covered <= {metadata} else OTHER_METADATA
+    node[0] = node[1] = None
+
+def _trie_collapse(node):
+    """
+    Merges sibling terminals with identical metadata into their parent.
+
+    Args:
+        node (list): The trie node to collapse, bottom-up.
+    """
+    for child in node[:2]:
+        if child is not None and child[2] is None:
+            _trie_collapse(child)
+
+    zero, one = node[0], node[1]
+    if zero is not None and one is not None and zero[2] is not None and zero[2] == one[2]:
+        node[2] = zero[2]
+        node[0] = node[1] = None
+
+def _trie_walk(node, network, prefixlen, width):
+    """
+    Walks the trie in address order.
+
+    Args:
+        node (list): The trie node to start from.
+        network (int): The network address of the node.
+        prefixlen (int): The prefix length of the node.
+        width (int): The address width in bits (32 or 128).
+
+    Yields:
+        tuple: (network, prefixlen, metadata) for every terminal.
+    """
+    if node[2] is not None:
+        yield network, prefixlen, node[2]
+        return
+
+    for bit in (0, 1):
+        child = node[bit]
+        if child is not None:
+            yield from _trie_walk(
+                child, network | (bit << (width - 1 - prefixlen)), prefixlen + 1, width
+            )
+
+def coalesce_with_metadata(starts, ends, metadata, ip_version):
     """
     Coalesces IP prefixes while preserving metadata where possible.
     
     Args:
-        prefixes_data (list): List of dictionaries containing prefix and metadata
+        starts (numpy.ndarray): The first address of each network
+        ends (numpy.ndarray): The last address of each network
+        metadata (list): The metadata tuple of each network
         ip_version (int): IP version (4 or 6)
     
     Returns:
         list: List of dictionaries with coalesced prefixes and appropriate metadata
     """
-    # Group prefixes by their metadata
-    grouped = defaultdict(list)
+    # Number each distinct metadata tuple
+    metadata_ids = {}
     prefix_key = 'ip_prefix' if ip_version == 4 else 'ipv6_prefix'
+    ids = np.fromiter(
+        (metadata_ids.setdefault(m, len(metadata_ids)) for m in metadata),
+        dtype=np.uint32,
+        count=len(metadata)
+    )
+    metadata_keys = list(metadata_ids)
     
-    for entry in prefixes_data:
-        metadata_key = (
-            entry.get('region', 'other'),
-            entry.get('service', 'OTHER'),
-            entry.get('network_border_group', 'other')
-        )
-        grouped[metadata_key].append(entry[prefix_key])
+    # Group prefixes by their metadata: sorting on the ids makes each group
+    # one contiguous slice of the sorted arrays
+    order = np.argsort(ids, kind='stable')
+    group_ids, group_starts = np.unique(ids[order], return_index=True)
+    group_ends = np.append(group_starts[1:], len(order))
+    starts = starts[order]
+    ends = ends[order]
     
-    # Coalesce within each metadata group
+    # Coalesce within each metadata group, and insert the results into a
+    # binary trie that resolves overlaps between the groups
     result = []
-    networks_with_metadata = []
+    width = 32 if ip_version == 4 else 128
+    format_cidr = _fmt_v4 if ip_version == 4 else _fmt_v6
+    root = [None, None, None]
+    index = {}
     
-    for (region, service, nbg), prefixes in grouped.items():
-        coalesced = coalesce_prefixes(prefixes, ip_version)
-        for network in coalesced:
-            networks_with_metadata.append({
-                'network': network,
-                'region': region,
-                'service': service,
-                'network_border_group': nbg
-            })
+    for group_id, lo, hi in zip(group_ids.tolist(), group_starts.tolist(), group_ends.tolist()):
+        metadata_key = metadata_keys[group_id]
+        for network, prefixlen in _coalesce_cidrs(starts[lo:hi], ends[lo:hi], ip_version):
+            _trie_insert(root, index, network, prefixlen, metadata_key, width)
     
-    # Check for overlaps between different metadata groups
-    # and merge with "other" metadata if networks can be combined
-    processed = []
-    skip_indices = set()
+    # Merge sibling networks that ended up with the same metadata
+    _trie_collapse(root)
     
-    for i, entry1 in enumerate(networks_with_metadata):
-        if i in skip_indices:
-            continue
-            
-        can_merge = []
-        for j, entry2 in enumerate(networks_with_metadata[i+1:], start=i+1):
-            if j in skip_indices:
-                continue
-            
-            # Check if networks are adjacent or overlapping
-            if entry1['network'].overlaps(entry2['network']) or \
-               entry1['network'].supernet_of(entry2['network']) or \
-               entry2['network'].supernet_of(entry1['network']):
-                can_merge.append(j)
-                skip_indices.add(j)
-        
-        if can_merge:
-            # Merge networks with different metadata
-            networks_to_merge = [entry1['network']]
-            metadata_matches = True
-            
-            for idx in can_merge:
-                networks_to_merge.append(networks_with_metadata[idx]['network'])
-                if (networks_with_metadata[idx]['region'] != entry1['region'] or
-                    networks_with_metadata[idx]['service'] != entry1['service'] or
-                    networks_with_metadata[idx]['network_border_group'] != entry1['network_border_group']):
-                    metadata_matches = False
-            
-            merged = list(collapse_addresses(networks_to_merge))
-            for network in merged:
-                if metadata_matches:
-                    processed.append({
-                        'network': network,
-                        'region': entry1['region'],
-                        'service': entry1['service'],
-                        'network_border_group': entry1['network_border_group']
-                    })
-                else:
-                    processed.append({
-                        'network': network,
-                        'region': 'other',
-                        'service': 'OTHER',
-                        'network_border_group': 'other'
-                    })
-        else:
-            processed.append(entry1)
+    # Convert to final format, walking the trie in network address order
+    for network, prefixlen, (region, service, nbg) in _trie_walk(root, 0, 0, width):
+        result.append({
+            prefix_key: format_cidr(network, prefixlen),
+            'region': region,
+            'service': service,
+            'network_border_group': nbg
+        })
     
-    # Convert to final format
-    for entry in processed:
-        if ip_version == 4:
-            result.append({
-                'ip_prefix': str(entry['network']),
-                'region': entry['region'],
-                'service': entry['service'],
-                'network_border_group': entry['network_border_group']
-            })
-        else:
-            result.append({
-                'ipv6_prefix': str(entry['network']),
-                'region': entry['region'],
-                'service': entry['service'],
-                'network_border_group': entry['network_border_group']
-            })
+    return result
+
+def _prefixes_by_address(entries, prefix_key, starts, ends):
+    """
+    List the prefix strings of entries in network address order.
     
-    # Sort by network address
-    if ip_version == 4:
-        result.sort(key=lambda x: IPv4Network(x['ip_prefix']))
-    else:
-        result.sort(key=lambda x: IPv6Network(x['ipv6_prefix']))
+    Networks with the same address are ordered widest first, the same way
+    IP network objects sort. The order comes from the parsed arrays, so the
+    strings are not parsed again.
     
-    return result
+    Args:
+        entries (list): Prefix entries from the AWS data
+        prefix_key (str): 'ip_prefix' or 'ipv6_prefix'
+        starts (numpy.ndarray): The first address of each entry's network
+        ends (numpy.ndarray): The last address of each entry's network
+    
+    Returns:
+        list: The sorted prefix strings
+    """
+    # Inverting the ends sorts larger ends, i.e. wider networks, first
+    order = np.lexsort(np.vstack([_sort_keys(~ends), _sort_keys(starts)]))
+    return [entries[i][prefix_key] for i in order.tolist()]
 
-def write_txt_file(data, filename, description):
+def render_txt_file(ipv4_cidrs, ipv6_cidrs, data, description, generated):
     """
-    Extract all CIDR blocks and write to text file with statistics.
+    Render sorted CIDR blocks as a text file with statistics.
     
     Args:
-        data (dict): JSON data containing prefixes
-        filename (str): Output filename
+        ipv4_cidrs (list): IPv4 CIDR strings in address order
+        ipv6_cidrs (list): IPv6 CIDR strings in address order
+        data (dict): JSON data with the creation date and sync token
         description (str): Description for the header
+        generated (str): Formatted generation timestamp for the header
+    
+    Returns:
+        bytes: The encoded text file contents
+    """
+    # Header with statistics
+    header = [
+        f"# AWS IP Ranges - {description}",
+        f"# Generated: {generated}",
+        f"# Source: {AWS_IP_RANGES_URL}",
+        f"# Creation Date: {data.get('createDate', 'Unknown')}",
+        f"# Sync Token: {data.get('syncToken', 'Unknown')}",
+        "#",
+        "# Statistics:",
+        f"# Total CIDR blocks: {len(ipv4_cidrs) + len(ipv6_cidrs)}",
+        f"# IPv4 blocks: {len(ipv4_cidrs)}",
+        f"# IPv6 blocks: {len(ipv6_cidrs)}",
+        "#",
+        f"# ========== IPv4 Prefixes ({len(ipv4_cidrs)} entries) ==========",
+        "#",
+    ]
+    
+    # Separator and IPv6 header
+    ipv6_header = [
+        "",
+        f"# ========== IPv6 Prefixes ({len(ipv6_cidrs)} entries) ==========",
+        "#",
+    ]
+    
+    # Join everything in one go instead of writing line by line
+    lines = header + ipv4_cidrs + ipv6_header + ipv6_cidrs
+    return ("\n".join(lines) + "\n").encode()
+
+def render_json_file(data):
+    """
+    Render JSON data with two-space indentation.
+    
+    Args:
+        data (dict): JSON data to render
+    
+    Returns:
+        bytes: The encoded JSON file contents
+    """
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+
+def txt_output(filename, ipv4_cidrs, ipv6_cidrs, data, description, generated):
     """
-    ipv4_cidrs = []
-    ipv6_cidrs = []
+    Render a text file and pair it with its filename and prefix counts.
     
-    # Extract IPv4 prefixes
-    for entry in data.get('prefixes', []):
-        ipv4_cidrs.append(entry['ip_prefix'])
+    Args:
+        filename (str): Output filename
+        ipv4_cidrs (list): IPv4 CIDR strings in address order
+        ipv6_cidrs (list): IPv6 CIDR strings in address order
+        data (dict): JSON data with the creation date and sync token
+        description (str): Description for the header
+        generated (str): Formatted generation timestamp for the header
     
-    # Extract IPv6 prefixes
-    for entry in data.get('ipv6_prefixes', []):
-        ipv6_cidrs.append(entry['ipv6_prefix'])
+    Returns:
+        tuple: (filename, contents, summary) for write_output_files
+    """
+    contents = render_txt_file(ipv4_cidrs, ipv6_cidrs, data, description, generated)
+    return filename, contents, f" (IPv4: {len(ipv4_cidrs)}, IPv6: {len(ipv6_cidrs)})"
+
+def _write_output_file(output):
+    """
+    Write one rendered output file to disk.
     
-    # Sort separately
-    ipv4_cidrs.sort(key=lambda x: IPv4Network(x))
-    ipv6_cidrs.sort(key=lambda x: IPv6Network(x))
+    Args:
+        output (tuple): (filename, contents, summary) as passed to
+            write_output_files
+    """
+    filename, contents, _ = output
+    with open(filename, 'wb') as f:
+        f.write(contents)
+
+def write_output_files(outputs):
+    """
+    Write the pre-rendered output files concurrently.
+    
+    The writes release the GIL, so running them on a thread pool overlaps
+    the disk I/O of the individual files.
     
-    # Write to file with header
-    with open(filename, 'w') as f:
-        # Write header with statistics
-        f.write(f"# AWS IP Ranges - {description}\n")
-        f.write(f"# Generated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}\n")
-        f.write(f"# Source: {AWS_IP_RANGES_URL}\n")
-        f.write(f"# Creation Date: {data.get('createDate', 'Unknown')}\n")
-        f.write(f"# Sync Token: {data.get('syncToken', 'Unknown')}\n")
-        f.write(f"#\n")
-        f.write(f"# Statistics:\n")
-        f.write(f"# Total CIDR blocks: {len(ipv4_cidrs) + len(ipv6_cidrs)}\n")
-        f.write(f"# IPv4 blocks: {len(ipv4_cidrs)}\n")
-        f.write(f"# IPv6 blocks: {len(ipv6_cidrs)}\n")
-        f.write(f"#\n")
-        f.write(f"# ========== IPv4 Prefixes ({len(ipv4_cidrs)} entries) ==========\n")
-        f.write("#\n")
-        
-        # Write IPv4 prefixes
-        for cidr in ipv4_cidrs:
-            f.write(f"{cidr}\n")
-        
-        # Separator and IPv6 header
-        f.write("\n")
-        f.write(f"# ========== IPv6 Prefixes ({len(ipv6_cidrs)} entries) ==========\n")
-        f.write("#\n")
-        
-        # Write IPv6 prefixes
-        for cidr in ipv6_cidrs:
-            f.write(f"{cidr}\n")
+    Args:
+        outputs (list): List of (filename, contents, summary) tuples, where
+            summary is appended to the success message
+    """
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        # Consume the results so that any write error is raised here
+        list(executor.map(_write_output_file, outputs))
     
-    print(f"Successfully created {filename} (IPv4: {len(ipv4_cidrs)}, IPv6: {len(ipv6_cidrs)})")
+    for filename, _, summary in outputs:
+        print(f"Successfully created {filename}{summary}")
 
 def print_reduction_stats(original_data, compacted_data, merged_data):
     """
@@ -265,6 +705,9 @@ def main():
     """
     Main function to orchestrate the fetching, processing, and output.
     """
+    # Stamp all output files with the same generation time.
+    generated = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
+
     # Get the raw data from the AWS URL.
     raw_data = get_ip_ranges()
 
@@ -272,24 +715,13 @@ def main():
     if not raw_data:
         sys.exit(1)
 
-    # Write the original AWS data to a JSON file.
-    with open("ip-ranges-original.json", "w") as f:
-        json.dump(raw_data, f, indent=2)
-    print("Successfully created ip-ranges-original.json")
-    
-    # Write original data to text file
-    write_txt_file(raw_data, "ip-ranges-original.txt", "Original")
-
-    # Extract IPv4 prefixes from the 'prefixes' key.
-    ipv4_prefixes = [p['ip_prefix'] for p in raw_data.get('prefixes', [])]
-
-    # Extract IPv6 prefixes from the 'ipv6_prefixes' key.
-    ipv6_prefixes = [p['ipv6_prefix'] for p in raw_data.get('ipv6_prefixes', [])]
+    # Parse the IPv4 and IPv6 prefixes once for both outputs below.
+    v4_starts, v4_ends, v4_meta, v6_starts, v6_ends, v6_meta = _parse_prefixes_once(raw_data)
 
-    # Coalesce the IPv4 prefixes.
-    coalesced_ipv4 = coalesce_prefixes(ipv4_prefixes, 4)
-    # Coalesce the IPv6 prefixes.
-    coalesced_ipv6 = coalesce_prefixes(ipv6_prefixes, 6)
+    # Coalesce and format the IPv4 prefixes.
+    coalesced_ipv4 = [_fmt_v4(*cidr) for cidr in _coalesce_cidrs(v4_starts, v4_ends, 4)]
+    # Coalesce and format the IPv6 prefixes.
+    coalesced_ipv6 = [_fmt_v6(*cidr) for cidr in _coalesce_cidrs(v6_starts, v6_ends, 6)]
 
     # Prepare the output dictionary in the same format as the original.
     compacted_data = {
@@ -297,35 +729,27 @@ def main():
         'createDate': raw_data.get('createDate'),
         'prefixes': [
             {
-                'ip_prefix': str(n),
+                'ip_prefix': cidr,
                 'region': 'other',
                 'service': 'OTHER',
                 'network_border_group': 'other'
             }
-            for n in sorted(coalesced_ipv4)
+            for cidr in coalesced_ipv4
         ],
         'ipv6_prefixes': [
             {
-                'ipv6_prefix': str(n),
+                'ipv6_prefix': cidr,
                 'region': 'other',
                 'service': 'OTHER',
                 'network_border_group': 'other'
             }
-            for n in sorted(coalesced_ipv6)
+            for cidr in coalesced_ipv6
         ]
     }
 
-    # Write the compacted data to a JSON file.
-    with open("ip-ranges-compacted.json", "w") as f:
-        json.dump(compacted_data, f, indent=2)
-    print("Successfully created ip-ranges-compacted.json")
-    
-    # Write compacted data to text file
-    write_txt_file(compacted_data, "ip-ranges-compacted.txt", "Compacted")
-
     # Create merged version with preserved metadata where possible
-    merged_ipv4 = coalesce_with_metadata(raw_data.get('prefixes', []), 4)
-    merged_ipv6 = coalesce_with_metadata(raw_data.get('ipv6_prefixes', []), 6)
+    merged_ipv4 = coalesce_with_metadata(v4_starts, v4_ends, v4_meta, 4)
+    merged_ipv6 = coalesce_with_metadata(v6_starts, v6_ends, v6_meta, 6)
     
     merged_data = {
         'syncToken': raw_data.get('syncToken'),
@@ -334,13 +758,26 @@ def main():
         'ipv6_prefixes': merged_ipv6
     }
     
-    # Write the merged data to a JSON file
-    with open("ip-ranges-merged.json", "w") as f:
-        json.dump(merged_data, f, indent=2)
-    print("Successfully created ip-ranges-merged.json")
+    # The original prefixes are listed in address order in the text file;
+    # the compacted and merged ones already are
+    original_ipv4 = _prefixes_by_address(raw_data.get('prefixes', []), 'ip_prefix', v4_starts, v4_ends)
+    original_ipv6 = _prefixes_by_address(raw_data.get('ipv6_prefixes', []), 'ipv6_prefix', v6_starts, v6_ends)
+    merged_ipv4_cidrs = [entry['ip_prefix'] for entry in merged_ipv4]
+    merged_ipv6_cidrs = [entry['ipv6_prefix'] for entry in merged_ipv6]
     
-    # Write merged data to text file
-    write_txt_file(merged_data, "ip-ranges-merged.txt", "Merged (Metadata Preserved)")
+    # Render the original, compacted and merged data as JSON and text files,
+    # then write them all at once
+    write_output_files([
+        ("ip-ranges-original.json", render_json_file(raw_data), ""),
+        txt_output("ip-ranges-original.txt", original_ipv4, original_ipv6,
+                   raw_data, "Original", generated),
+        ("ip-ranges-compacted.json", render_json_file(compacted_data), ""),
+        txt_output("ip-ranges-compacted.txt", coalesced_ipv4, coalesced_ipv6,
+                   compacted_data, "Compacted", generated),
+        ("ip-ranges-merged.json", render_json_file(merged_data), ""),
+        txt_output("ip-ranges-merged.txt", merged_ipv4_cidrs, merged_ipv6_cidrs,
+                   merged_data, "Merged (Metadata Preserved)", generated),
+    ])
     
     # Print reduction statistics
     print_reduction_stats(raw_data, compacted_data, merged_data)